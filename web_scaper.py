@@ -1,24 +1,81 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import requests
+import lxml.etree
+import lxml.html
 from dotenv import load_dotenv
 import os
-import json
+import re
+import orjson
+import hashlib
+import queue
 import time
-from flask import Flask, jsonify, render_template_string
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, jsonify
+from waitress import serve
 from pathlib import Path
 from datetime import datetime
-import random
+from operator import itemgetter
+from http.cookiejar import LoadError, MozillaCookieJar
 
 # Load environment variables
 load_dotenv()
 
+def load_credentials():
+    """Collect CF_USERNAME_<n>/CF_PASSWORD_<n> pairs from the environment, keyed by n"""
+    credentials = {}
+    for key, username in os.environ.items():
+        if not key.startswith('CF_USERNAME_'):
+            continue
+        # Only canonical ASCII numbers, so CF_USERNAME_01 cannot shadow CF_USERNAME_1
+        suffix = key[len('CF_USERNAME_'):]
+        if not re.fullmatch(r'0|[1-9][0-9]*', suffix):
+            continue
+        password = os.environ.get(f'CF_PASSWORD_{suffix}')
+        if username and password:
+            credentials[int(suffix)] = (username, password)
+    return credentials
+
+# Credentials are read once at startup instead of on every request
+CREDENTIALS = load_credentials()
+
 # Base directory for all user data
 BASE_DATA_DIR = Path("scraped_data")
 
+# CSES endpoints
+LOGIN_URL = "https://cses.fi/login"
+PROBLEM_LIST_URL = "https://cses.fi/problemset/list/"
+
+# Only present in the page header when the visitor is not logged in
+LOGIN_LINK = b'href="/login"'
+
+# XPath expressions compiled once and reused for every scrape
+CSRF_TOKEN_XPATH = lxml.etree.XPath('//input[@name="csrf_token"]/@value')
+TASK_LIST_XPATH = lxml.etree.XPath('//div[@class="content"]//ul[contains(@class, "task-list")]')
+SECTION_NAME_XPATH = lxml.etree.XPath('preceding-sibling::h2[1]/text()')
+TASK_XPATH = lxml.etree.XPath('li[contains(@class, "task")]')
+TASK_LINK_XPATH = lxml.etree.XPath('.//a[@href]')
+# Matches 'full' as a whole class token, not as a substring
+SOLVED_XPATH = lxml.etree.XPath(
+    'boolean(descendant-or-self::*[contains(concat(" ", normalize-space(@class), " "), " full ")])'
+)
+
+# Timeout (seconds) for every HTTP request to CSES
+REQUEST_TIMEOUT = 20
+
+# Number of solved/unsolved snapshot pairs kept per user
+SNAPSHOT_KEEP = 10
+
+# Seconds a rendered leaderboard page may be served again
+LEADERBOARD_CACHE_TTL = 30
+# Seconds between full re-scans of the stats files on disk
+LEADERBOARD_RESCAN_INTERVAL = 300
+
+# Number of warm HTTP sessions shared between requests
+SESSION_POOL_SIZE = 4
+# Sessions are recycled after this many scrapes
+SESSION_MAX_USES = 50
+
 # HTML template for leaderboard
 LEADERBOARD_TEMPLATE = """
 <!DOCTYPE html>
@@ -125,97 +182,309 @@ def ensure_user_directory(username):
     user_dir.mkdir(parents=True, exist_ok=True)
     return user_dir
 
+def snapshot_files(user_dir, timestamp):
+    """Return the solved/unsolved snapshot paths for a scrape timestamp"""
+    return (user_dir / f"solved_{timestamp}.json",
+            user_dir / f"unsolved_{timestamp}.json")
+
+def is_valid_stats(stats):
+    """Check that a loaded stats.json has every field the app reads from it"""
+    return (
+        isinstance(stats, dict)
+        and isinstance(stats.get("username"), str)
+        and isinstance(stats.get("timestamp"), str)
+        and isinstance(stats.get("solved_count"), int)
+        and isinstance(stats.get("total_count"), int)
+        and stats["total_count"] > 0
+    )
+
+def load_previous_stats(user_dir):
+    """Load stats.json if it and the snapshot files it points to still exist"""
+    stats_file = user_dir / "stats.json"
+    if not stats_file.exists():
+        return None
+    # A corrupt or partial stats.json is overwritten by the next full scrape
+    try:
+        with open(stats_file, 'rb') as f:
+            stats = orjson.loads(f.read())
+    except orjson.JSONDecodeError:
+        return None
+    if not is_valid_stats(stats):
+        return None
+    if not all(path.exists() for path in snapshot_files(user_dir, stats["timestamp"])):
+        return None
+    return stats
+
+def load_last_hash(user_dir):
+    """Return the content hash of the last saved snapshot, if any"""
+    hash_file = user_dir / "last_hash"
+    if not hash_file.exists():
+        return None
+    return hash_file.read_text(encoding='utf-8').strip()
+
+def problems_hash(problems_data):
+    """Hash the solved/unsolved problem lists to detect unchanged scrapes"""
+    return hashlib.blake2b(
+        orjson.dumps(problems_data["solved"]) + orjson.dumps(problems_data["unsolved"]),
+        digest_size=16
+    ).hexdigest()
+
+def default_file_mode():
+    """Return the mode open() would give a new file under the current umask"""
+    # os.umask can only be read by setting it, so do this once at import
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+# mkstemp creates files as 0600; atomic writes restore the usual mode
+FILE_MODE = default_file_mode()
+
+def write_atomic(path, data):
+    """Write bytes to path via a temporary file so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), FILE_MODE)
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def dump_atomic(path, obj):
+    """Serialize obj as indented JSON with orjson and write it atomically"""
+    write_atomic(path, orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+def rotate_snapshots(user_dir, keep=SNAPSHOT_KEEP):
+    """Delete all but the newest `keep` solved/unsolved snapshot pairs"""
+    # Timestamps are YYYYmmdd_HHMMSS, so name order is chronological
+    timestamps = sorted(path.name[len("solved_"):-len(".json")] for path in user_dir.glob("solved_*.json"))
+    for timestamp in timestamps[:-keep]:
+        for path in snapshot_files(user_dir, timestamp):
+            path.unlink(missing_ok=True)
+
+def load_cache(user_dir):
+    """Load the HTTP validators and body hash saved by the last scrape"""
+    cache_file = user_dir / "cache.json"
+    if not cache_file.exists():
+        return {}
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = orjson.loads(f.read())
+    except orjson.JSONDecodeError:
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_cache(user_dir, cache):
+    """Persist the HTTP validators and body hash for the next scrape"""
+    dump_atomic(user_dir / "cache.json", cache)
+
 app = Flask(__name__)
 
-def setup_driver():
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('--disable-gpu')
+# Compile the leaderboard template once instead of on every request
+leaderboard_template = app.jinja_env.from_string(LEADERBOARD_TEMPLATE)
+# (registry version, expiry, html) of the last rendered leaderboard
+rendered_leaderboard = None
+
+def load_all_stats():
+    """Read every user's stats.json from disk, keyed by username"""
+    all_stats = {}
+    if not BASE_DATA_DIR.is_dir():
+        return all_stats
+    with os.scandir(BASE_DATA_DIR) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # Skip missing or corrupt files so one bad user cannot empty the board
+                try:
+                    with open(os.path.join(entry.path, "stats.json"), 'rb') as f:
+                        stats = orjson.loads(f.read())
+                except (FileNotFoundError, orjson.JSONDecodeError) as e:
+                    print(f"Skipping stats for {entry.name}: {str(e)}")
+                    continue
+                if not is_valid_stats(stats):
+                    print(f"Skipping stats for {entry.name}: missing or invalid fields")
+                    continue
+                all_stats[stats["username"]] = stats
+    return all_stats
+
+def update_leaderboard(username, stats):
+    """Record a user's fresh stats in the in-memory leaderboard"""
+    global leaderboard_version
+    with leaderboard_lock:
+        leaderboard_version += 1
+        leaderboard_stats[username] = stats
+        leaderboard_updated[username] = leaderboard_version
+
+def refresh_leaderboard():
+    """Replace the in-memory leaderboard with a full re-scan and schedule the next one"""
+    global leaderboard_stats, leaderboard_updated, leaderboard_version
+    try:
+        with leaderboard_lock:
+            scan_started = leaderboard_version
+        all_stats = load_all_stats()
+        with leaderboard_lock:
+            # Scrapes that finished during the scan are newer than what was read
+            for username, version in leaderboard_updated.items():
+                if version > scan_started:
+                    all_stats[username] = leaderboard_stats[username]
+            leaderboard_stats = all_stats
+            leaderboard_updated = {}
+            leaderboard_version += 1
+    except Exception as e:
+        print(f"Error refreshing leaderboard: {str(e)}")
     
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.implicitly_wait(10)
-    return driver
+    timer = threading.Timer(LEADERBOARD_RESCAN_INTERVAL, refresh_leaderboard)
+    timer.daemon = True
+    timer.start()
+
+# Latest stats per username, served by /leaderboard without touching disk
+leaderboard_lock = threading.Lock()
+leaderboard_stats = {}
+# Registry version at which each username was last updated by a scrape
+leaderboard_updated = {}
+leaderboard_version = 0
+refresh_leaderboard()
+
+class SessionExpired(Exception):
+    """Raised when CSES serves a page to a session that is not logged in"""
+
+def setup_session():
+    """Create an HTTP session that keeps the CSES login cookie"""
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'Mozilla/5.0 (compatible; CsES-Web-scraper)'})
+    return session
 
-def login_to_cses(driver, wait, username, password):
+def acquire_session():
+    """Take a warm session and its use count from the pool, blocking if all are busy"""
+    return session_pool.get()
+
+def release_session(session, uses):
+    """Reset a session's login state and return it to the pool"""
+    session.cookies.clear()
+    if uses >= SESSION_MAX_USES:
+        session.close()
+        session, uses = setup_session(), 0
+    session_pool.put((session, uses))
+
+# Pre-warmed sessions keep their connections to cses.fi open between scrapes
+session_pool = queue.Queue()
+for _ in range(SESSION_POOL_SIZE):
+    session_pool.put((setup_session(), 0))
+
+def login_to_cses(session, username, password):
     """Handle CSES login process"""
     try:
-        driver.get("https://cses.fi/login")
-        time.sleep(random.uniform(2, 4))  # Random delay
-        
-        username_field = wait.until(EC.presence_of_element_located((By.NAME, "nick")))
-        username_field.clear()
-        username_field.send_keys(username)
-        
-        time.sleep(random.uniform(1, 2))  # Random delay
+        response = session.get(LOGIN_URL, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
         
-        password_field = wait.until(EC.presence_of_element_located((By.NAME, "pass")))
-        password_field.clear()
-        password_field.send_keys(password)
+        # The login form carries a per-session CSRF token
+        doc = lxml.html.fromstring(response.content)
+        tokens = CSRF_TOKEN_XPATH(doc)
+        if not tokens:
+            return False, "Login error: CSRF token not found on login page"
         
-        time.sleep(random.uniform(1, 2))  # Random delay
+        response = session.post(LOGIN_URL, data={
+            "csrf_token": tokens[0],
+            "nick": username,
+            "pass": password
+        }, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
         
-        submit = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[type="submit"]')))
-        submit.click()
-        
-        time.sleep(random.uniform(3, 5))  # Random delay
-        
-        if "Login" in driver.title:
+        title = lxml.html.fromstring(response.content).findtext('.//title') or ""
+        if "Login" in title:
             return False, "Login failed. Please check credentials."
         return True, "Login successful"
     except Exception as e:
         return False, f"Login error: {str(e)}"
 
-def scrape_problem_data(driver, wait):
-    """Scrape problem set data"""
+def load_cookies(session, user_dir):
+    """Restore a saved CSES login into the session, returning whether one was found"""
+    cookie_file = user_dir / "cookies.txt"
+    if not cookie_file.exists():
+        return False
+    jar = MozillaCookieJar(cookie_file)
     try:
-        driver.get("https://cses.fi/problemset/list/")  # Changed URL to list view
-        time.sleep(random.uniform(3, 5))  # Random delay
+        # The CSES session cookie has no expiry, so keep discardable cookies
+        jar.load(ignore_discard=True)
+    except (OSError, LoadError):
+        return False
+    session.cookies.update(jar)
+    return len(jar) > 0
+
+def save_cookies(session, user_dir):
+    """Save the session's CSES login so later scrapes can skip logging in"""
+    cookie_file = user_dir / "cookies.txt"
+    jar = MozillaCookieJar(cookie_file)
+    for cookie in session.cookies:
+        jar.set_cookie(cookie)
+    jar.save(ignore_discard=True)
+    # save() only creates new files as 0600 on Python 3.11+ and never
+    # tightens an existing file, so enforce it for the live login token
+    os.chmod(cookie_file, 0o600)
+
+def parse_problem_list(content):
+    """Parse the problem list HTML into a flat list of problems"""
+    doc = lxml.html.fromstring(content)
+    doc.make_links_absolute(PROBLEM_LIST_URL)
+    
+    problems = []
+    # Each section is an <h2> followed by its <ul class="task-list">
+    for task_list in TASK_LIST_XPATH(doc):
+        headings = SECTION_NAME_XPATH(task_list)
+        section_name = headings[0].strip() if headings else ""
         
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "task-list")))
+        for problem in TASK_XPATH(task_list):
+            links = TASK_LINK_XPATH(problem)
+            if not links:
+                continue
+            
+            # Check for the 'full' class which indicates a solved problem
+            is_solved = SOLVED_XPATH(problem)
+            
+            problems.append({
+                "name": links[0].text_content().strip(),
+                "link": links[0].get("href"),
+                "section": section_name,
+                "solved": is_solved
+            })
+    return problems
+
+def scrape_problem_data(session, cache):
+    """Scrape problem set data
+    
+    Returns (True, None) when the page is unchanged since the scrape that
+    produced ``cache``. On a fresh download ``cache`` is updated in place.
+    Raises SessionExpired if the page was served to a logged-out visitor.
+    """
+    try:
+        # Let the server answer 304 if the list has not changed
+        headers = {}
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
         
-        solved_problems = []
-        unsolved_problems = []
+        response = session.get(PROBLEM_LIST_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return True, None
+        response.raise_for_status()
         
-        # Find all task lists (sections)
-        task_lists = driver.find_elements(By.CLASS_NAME, "task-list")
+        # Logged-out visitors get the list with a "Login" link in the header
+        if LOGIN_LINK in response.content:
+            raise SessionExpired("Not logged in")
         
-        for task_list in task_lists:
-            try:
-                section_name = task_list.find_element(By.TAG_NAME, "h2").text
-                problems = task_list.find_elements(By.CLASS_NAME, "task")
-                
-                for problem in problems:
-                    try:
-                        problem_link = problem.find_element(By.TAG_NAME, "a")
-                        name = problem_link.text
-                        href = problem_link.get_attribute("href")
-                        
-                        # Check for the 'full' class which indicates a solved problem
-                        classes = problem.get_attribute("class").split()
-                        is_solved = any('full' in class_name for class_name in classes)
-                        
-                        problem_data = {
-                            "name": name,
-                            "link": href,
-                            "section": section_name,
-                            "solved": is_solved
-                        }
-                        
-                        if is_solved:
-                            solved_problems.append(problem_data)
-                        else:
-                            unsolved_problems.append(problem_data)
-                            
-                    except Exception as e:
-                        print(f"Error processing problem: {str(e)}")
-                        continue
-                        
-            except Exception as e:
-                print(f"Error processing section: {str(e)}")
-                continue
+        # Fall back to comparing the body when the server sends no validators
+        body_sha256 = hashlib.sha256(response.content).hexdigest()
+        cache["etag"] = response.headers.get("ETag")
+        cache["last_modified"] = response.headers.get("Last-Modified")
+        if body_sha256 == cache.get("body_sha256"):
+            return True, None
+        cache["body_sha256"] = body_sha256
+        
+        problems = parse_problem_list(response.content)
+        
+        solved_problems = [p for p in problems if p["solved"]]
+        unsolved_problems = [p for p in problems if not p["solved"]]
                 
         if not solved_problems and not unsolved_problems:
             return False, "No problems found on the page"
@@ -226,51 +495,98 @@ def scrape_problem_data(driver, wait):
             "total_solved": len(solved_problems),
             "total_problems": len(solved_problems) + len(unsolved_problems)
         }
+    except SessionExpired:
+        raise
     except Exception as e:
         return False, f"Scraping error: {str(e)}"
 
-@app.route('/scrape/<int:user_number>')
-def scrape(user_number=1):
-    driver = None
+def refresh_last_updated(username, user_dir, stats):
+    """Stamp an unchanged scrape's stats with the current time, keeping its snapshot"""
+    stats["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    dump_atomic(user_dir / "stats.json", stats)
+    update_leaderboard(username, stats)
+
+def unchanged_response(username, user_dir, previous_stats):
+    """Build the response for a scrape that found nothing new"""
+    solved_file, unsolved_file = snapshot_files(user_dir, previous_stats["timestamp"])
+    return {
+        'status': 'unchanged',
+        'message': f'No changes for user {username}',
+        'solved_count': previous_stats["solved_count"],
+        'total_problems': previous_stats["total_count"],
+        'files': {
+            'solved': str(solved_file),
+            'unsolved': str(unsolved_file),
+            'stats': str(user_dir / "stats.json")
+        }
+    }
+
+def scrape_user(user_number):
+    """Scrape and save one user's data, returning (response body, status code)"""
+    if user_number not in CREDENTIALS:
+        return {'error': f'User {user_number} credentials not found'}, 404
+    username, password = CREDENTIALS[user_number]
+    
+    session, uses = acquire_session()
     try:
-        driver = setup_driver()
-        wait = WebDriverWait(driver, 20)
-        
-        username_key = f'CF_USERNAME_{user_number}'
-        password_key = f'CF_PASSWORD_{user_number}'
-        username = os.getenv(username_key)
-        password = os.getenv(password_key)
-        
-        if not username or not password:
-            return jsonify({'error': f'User {user_number} credentials not found'}), 404
-            
         user_dir = ensure_user_directory(username)
         
-        success, message = login_to_cses(driver, wait, username, password)
-        if not success:
-            return jsonify({'error': message}), 401
+        # Reuse the login from an earlier scrape when we have one
+        restored = load_cookies(session, user_dir)
+        if not restored:
+            success, message = login_to_cses(session, username, password)
+            if not success:
+                return {'error': message}, 401
+            save_cookies(session, user_dir)
             
-        success, problems_data = scrape_problem_data(driver, wait)
+        # Validators are only usable while the previous snapshot is on disk
+        previous_stats = load_previous_stats(user_dir)
+        cache = load_cache(user_dir) if previous_stats else {}
+        
+        try:
+            success, problems_data = scrape_problem_data(session, cache)
+        except SessionExpired:
+            if not restored:
+                raise
+            # The saved login has expired, so log in again and retry once
+            session.cookies.clear()
+            success, message = login_to_cses(session, username, password)
+            if not success:
+                return {'error': message}, 401
+            save_cookies(session, user_dir)
+            success, problems_data = scrape_problem_data(session, cache)
         if not success:
-            return jsonify({'error': problems_data}), 500
+            return {'error': problems_data}, 500
+        
+        stats_file = user_dir / "stats.json"
+        
+        if problems_data is None:
+            # Nothing changed, so the previous snapshot is still current
+            save_cache(user_dir, cache)
+            refresh_last_updated(username, user_dir, previous_stats)
+            return unchanged_response(username, user_dir, previous_stats), 200
+        
+        # The page can differ while the problem lists themselves do not
+        content_hash = problems_hash(problems_data)
+        if previous_stats and content_hash == load_last_hash(user_dir):
+            save_cache(user_dir, cache)
+            refresh_last_updated(username, user_dir, previous_stats)
+            return unchanged_response(username, user_dir, previous_stats), 200
             
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        solved_file, unsolved_file = snapshot_files(user_dir, timestamp)
         
         # Save solved problems
-        solved_file = user_dir / f"solved_{timestamp}.json"
-        with open(solved_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "total_solved": problems_data["total_solved"],
-                "problems": problems_data["solved"]
-            }, f, indent=4, ensure_ascii=False)
+        dump_atomic(solved_file, {
+            "total_solved": problems_data["total_solved"],
+            "problems": problems_data["solved"]
+        })
             
         # Save unsolved problems
-        unsolved_file = user_dir / f"unsolved_{timestamp}.json"
-        with open(unsolved_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "total_unsolved": len(problems_data["unsolved"]),
-                "problems": problems_data["unsolved"]
-            }, f, indent=4, ensure_ascii=False)
+        dump_atomic(unsolved_file, {
+            "total_unsolved": len(problems_data["unsolved"]),
+            "problems": problems_data["unsolved"]
+        })
             
         # Save stats
         stats = {
@@ -282,24 +598,29 @@ def scrape(user_number=1):
             "sections": {}
         }
         
-        # Calculate section-wise stats
+        # Calculate section-wise [solved, total] counts in one pass per list
+        sections = {}
         for problem in problems_data["solved"]:
-            section = problem["section"]
-            if section not in stats["sections"]:
-                stats["sections"][section] = {"solved": 0, "total": 0}
-            stats["sections"][section]["solved"] += 1
+            counts = sections.setdefault(problem["section"], [0, 0])
+            counts[0] += 1
+            counts[1] += 1
             
-        for problem in problems_data["solved"] + problems_data["unsolved"]:
-            section = problem["section"]
-            if section not in stats["sections"]:
-                stats["sections"][section] = {"solved": 0, "total": 0}
-            stats["sections"][section]["total"] += 1
+        for problem in problems_data["unsolved"]:
+            sections.setdefault(problem["section"], [0, 0])[1] += 1
         
-        stats_file = user_dir / "stats.json"
-        with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=4, ensure_ascii=False)
+        stats["sections"] = {
+            section: {"solved": solved, "total": total}
+            for section, (solved, total) in sections.items()
+        }
+        
+        dump_atomic(stats_file, stats)
+        update_leaderboard(username, stats)
+        
+        write_atomic(user_dir / "last_hash", content_hash.encode('utf-8'))
+        save_cache(user_dir, cache)
+        rotate_snapshots(user_dir)
         
-        return jsonify({
+        return {
             'status': 'success',
             'message': f'Data saved for user {username}',
             'solved_count': problems_data["total_solved"],
@@ -309,38 +630,78 @@ def scrape(user_number=1):
                 'unsolved': str(unsolved_file),
                 'stats': str(stats_file)
             }
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
     finally:
-        if driver:
-            driver.quit()
+        release_session(session, uses + 1)
+
+@app.route('/scrape/<int:user_number>')
+def scrape(user_number=1):
+    body, status = scrape_user(user_number)
+    return jsonify(body), status
+
+@app.route('/scrape_all')
+def scrape_all():
+    if not CREDENTIALS:
+        return jsonify({'error': 'No user credentials configured'}), 404
+    
+    # Each worker borrows its own session, so the pool size bounds concurrency
+    results = {}
+    with ThreadPoolExecutor(max_workers=SESSION_POOL_SIZE) as executor:
+        futures = {executor.submit(scrape_user, n): n for n in sorted(CREDENTIALS)}
+        for future in as_completed(futures):
+            user_number = futures[future]
+            body, status = future.result()
+            results[user_number] = dict(body, user_number=user_number, status_code=status)
+    
+    # 'partial' when only some users succeeded, 500 when none did
+    succeeded = sum(1 for result in results.values() if result['status_code'] == 200)
+    if succeeded == len(results):
+        status, status_code = 'success', 200
+    elif succeeded:
+        status, status_code = 'partial', 200
+    else:
+        status, status_code = 'error', 500
+    
+    return jsonify({
+        'status': status,
+        'users': [results[n] for n in sorted(results)]
+    }), status_code
 
 @app.route('/leaderboard')
 def leaderboard():
+    global rendered_leaderboard
     try:
-        users_data = []
-        for user_dir in BASE_DATA_DIR.iterdir():
-            if user_dir.is_dir():
-                stats_file = user_dir / "stats.json"
-                if stats_file.exists():
-                    with open(stats_file, 'r', encoding='utf-8') as f:
-                        stats = json.load(f)
-                        stats['progress'] = (stats['solved_count'] / stats['total_count']) * 100
-                        users_data.append(stats)
+        # Reuse the last page while the registry has not changed
+        with leaderboard_lock:
+            version = leaderboard_version
+            all_stats = list(leaderboard_stats.values())
+        cached = rendered_leaderboard
+        if cached and cached[0] == version and time.monotonic() < cached[1]:
+            return cached[2]
+        
+        # Copy each entry so the registry itself is never modified
+        users_data = [
+            dict(stats, progress=(stats['solved_count'] / stats['total_count']) * 100)
+            for stats in all_stats
+        ]
         
         # Sort users by solved count (descending)
-        users_data.sort(key=lambda x: x['solved_count'], reverse=True)
+        users_data.sort(key=itemgetter('solved_count'), reverse=True)
         
-        return render_template_string(
-            LEADERBOARD_TEMPLATE,
+        html = leaderboard_template.render(
             users=users_data,
             timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         )
+        rendered_leaderboard = (version, time.monotonic() + LEADERBOARD_CACHE_TTL, html)
+        return html
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(port=3000, debug=True)
+    # Waitress serves requests on a thread pool, so a slow /scrape no longer
+    # blocks /leaderboard; concurrent scrapes are bounded by the session pool
+    serve(app, host='127.0.0.1', port=3000, threads=8)